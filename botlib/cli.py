@@ -11,6 +11,13 @@ def DirType(string: str) -> str:
         'Directory does not exist: "{}"'.format(os.path.abspath(string)))
 
 
+def FilePathType(string: str) -> str:
+    if os.path.isfile(string):
+        return string
+    raise ArgumentTypeError(
+        'File does not exist: "{}"'.format(os.path.abspath(string)))
+
+
 class Cli(ArgumentParser):
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         super().__init__(*args, **kwargs)
@@ -27,5 +34,9 @@ class Cli(ArgumentParser):
     def arg_file(self, *args: Any, mode: str = 'r', **kwargs: Any) -> None:
         self.add_argument(*args, **kwargs, type=FileType(mode))
 
+    def arg_path(self, *args: Any, **kwargs: Any) -> None:
+        ''' Like `arg_file()` but return path instead of opened file. '''
+        self.add_argument(*args, **kwargs, type=FilePathType)
+
     def parse(self) -> Namespace:
         return self.parse_args()
@@ -1,18 +1,62 @@
 #!/usr/bin/env python3
+import heapq
+import sched
 from sys import stderr
-from threading import Timer
-from datetime import datetime as date
-from typing import List, Any, Optional, Iterable, Callable
+from time import time
+from itertools import count
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, Lock, Event, current_thread
+from datetime import datetime as date, timedelta
+from typing import List, Tuple, Any, Optional, Iterable, Callable
 
 CronCallback = Callable[[Any], None]
+HeapEntry = Tuple[int, int, 'Cron.Job']  # (next-fire, tie-breaker, job)
 
+# All Cron instances share a single scheduler thread
+_scheduler_lock = Lock()
+_scheduler_thread = None  # type: Optional[Thread]
+_scheduler_wakeup = Event()
 
-class RepeatTimer(Timer):
-    ''' Repeatedly call function with defined time interval. '''
 
-    def run(self) -> None:
-        while not self.finished.wait(self.interval):
-            self.function(*self.args, **self.kwargs)
+def _scheduler_sleep(delay: float) -> None:
+    ''' Interruptible sleep. Wake up early if the queue was modified. '''
+    _scheduler_wakeup.wait(delay)
+    _scheduler_wakeup.clear()
+
+
+_scheduler = sched.scheduler(time, _scheduler_sleep)
+
+
+def _scheduler_run() -> None:
+    ''' Process events until queue is empty, then terminate thread. '''
+    global _scheduler_thread
+    try:
+        while True:
+            with _scheduler_lock:
+                if _scheduler.empty():
+                    _scheduler_thread = None
+                    return
+            try:
+                _scheduler.run()
+            except Exception as e:  # never let one Cron stop all others
+                print(f'Cron error: {e!r}', file=stderr)
+    finally:
+        with _scheduler_lock:
+            if _scheduler_thread is current_thread():  # died unexpectedly
+                _scheduler_thread = None
+
+
+def _scheduler_enter(abs_time: float, action: Callable[[], None]) \
+        -> sched.Event:
+    ''' Queue action on shared scheduler. Start thread if not running. '''
+    global _scheduler_thread
+    with _scheduler_lock:
+        event = _scheduler.enterabs(abs_time, 1, action)
+        if not _scheduler_thread:
+            _scheduler_thread = Thread(target=_scheduler_run, name='Cron')
+            _scheduler_thread.start()
+    _scheduler_wakeup.set()
+    return event
 
 
 class Cron:
@@ -30,6 +74,7 @@ class Cron:
             self.interval = interval
             self.callback = callback
             self.object = object
+            self._running = Lock()  # at most one instance with thread pool
 
         def run(self, ts: int = 0) -> None:
             if self.interval > 0 and ts % self.interval == 0:
@@ -40,23 +85,41 @@ class Cron:
         interval: int,
         callback: CronCallback,
         arg: Any = None,
-        *, sleep: Iterable[int] = range(1, 8)
+        *, sleep: Iterable[int] = range(1, 8),
+        max_workers: int = 0
     ) -> 'Cron':
         ''' Convenient initializer. Add job and start timer. '''
-        cron = Cron(sleep=sleep)
+        cron = Cron(sleep=sleep, max_workers=max_workers)
         cron.add_job(interval, callback, arg)
         cron.start()
         return cron
 
-    def __init__(self, *, sleep: Iterable[int] = range(1, 8)):
+    def __init__(
+        self,
+        *, sleep: Iterable[int] = range(1, 8),
+        max_workers: int = 0
+    ):
+        '''
+        :sleep:       Hours in which no job is executed.
+        :max_workers: If > 0, jobs run in parallel on a thread pool.
+                      A job is skipped if its previous run is not finished.
+                      If 0, jobs run one after another on the cron thread.
+        '''
         self.sleep = sleep
-        self._timer = None  # type: Optional[RepeatTimer]
-        self._last_t = -1
+        self._pool = ThreadPoolExecutor(max_workers=max_workers) \
+            if max_workers > 0 else None
+        self._event = None  # type: Optional[sched.Event]
+        self._next = 0  # type: float # absolute time of next wake-up
+        self._lock = Lock()  # guards _event and _next
+        self._order = count()  # heap tie-breaker, never compare jobs
+        self._heap_ts = -1  # last processed minute
         self.clear()
 
     def clear(self) -> None:
         ''' Remove all previously added jobs. '''
         self.jobs = []  # type: List[Cron.Job]
+        self._heap = None  # type: Optional[List[HeapEntry]]
+        self._wake_soon()
 
     def add_job(self, interval: int, callback: CronCallback, arg: Any = None) \
             -> Job:
@@ -70,10 +133,15 @@ class Cron:
         ''' Queue an existing job. '''
         assert isinstance(job, Cron.Job), type(job)
         self.jobs.append(job)
+        self._heap = None  # rebuild on next tick
+        self._wake_soon()
 
     def pop(self, key: str) -> Job:
         ''' Return and remove job with known key. '''
-        return self.jobs.pop(self.jobs.index(self.get(key)))
+        job = self.jobs.pop(self.jobs.index(self.get(key)))
+        self._heap = None  # rebuild on next tick
+        self._wake_soon()
+        return job
 
     def get(self, key: str) -> Job:
         ''' Find job with known key. job.object must be list[0] or str.  '''
@@ -101,69 +169,167 @@ class Cron:
         self.clear()
         try:
             with open(fname) as fp:
-                for line in fp.readlines():
-                    if line.startswith('#'):
-                        continue
-                    time, *obj = [x.strip() or None for x in line.split(',')]
-                    obj = [fn(o) if o else None for o, fn in zip(obj, cols)]
-                    if len(obj) < len(cols):
-                        obj += [None] * (len(cols) - len(obj))
-                    self.add_job(int(time or 0), callback, obj)
+                lines = fp.read().splitlines()
         except FileNotFoundError:
-            print('File "{}" not found. No jobs loaded.'.format(fname),
-                  file=stderr)
+            print(f'File "{fname}" not found. No jobs loaded.', file=stderr)
+            return 0
+        for line in lines:
+            if line.startswith('#'):
+                continue
+            interval, *obj = [x.strip() or None for x in line.split(',')]
+            obj = [fn(o) if o else None for o, fn in zip(obj, cols)]
+            if len(obj) < len(cols):
+                obj += [None] * (len(cols) - len(obj))
+            self.add_job(int(interval or 0), callback, obj)
         return len(self.jobs)
 
     def save_csv(self, fname: str, *, cols: List[str]) -> None:
         ''' Persist in-memory jobs to CSV file. `cols` are column headers. '''
+        lines = [' , '.join(['# interval'] + cols)]
+        for job in self.jobs:
+            if not job.object:
+                continue
+            parts = [str(job.interval)]
+            if isinstance(job.object, list):
+                parts.extend('' if x is None else str(x) for x in job.object)
+            else:
+                parts.append(str(job.object))
+            lines.append(','.join(parts))
         with open(fname, 'w') as fp:
-            fp.write(' , '.join(['# interval'] + cols) + '\n')
-            for job in self.jobs:
-                if not job.object:
-                    continue
-                fp.write(str(job.interval))
-                if isinstance(job.object, list):
-                    for x in job.object:
-                        fp.write(',' + ('' if x is None else str(x)))
-                else:
-                    fp.write(',' + str(job.object))
-                fp.write('\n')
+            fp.write('\n'.join(lines) + '\n')
 
     # Handle repeat timer
 
     def start(self) -> None:
-        ''' Start cron timer interval. Check every 15 sec. '''
-        if not self._timer:
-            self._timer = RepeatTimer(15, self._callback)
-            self._timer.start()  # cancel()
+        '''
+        Start cron timer interval. Wake up at the next full minute and then
+        only at minutes in which a job is due.
+        '''
+        with self._lock:
+            if not self._event:
+                self._next = (int(time()) // 60 + 1) * 60
+                self._arm()
 
     def stop(self) -> None:
         ''' Stop or pause timer. '''
-        if self._timer:
-            if self._timer.is_alive():
-                self._timer.cancel()
-            self._timer = None
+        with self._lock:
+            if self._event:
+                event = self._event
+                self._event = None
+                try:
+                    _scheduler.cancel(event)
+                    _scheduler_wakeup.set()  # let thread quit if queue empty
+                except ValueError:
+                    pass  # currently running, will not re-arm
 
     def fire(self) -> None:
         ''' Run all jobs immediatelly. '''
-        now = date.now()
-        self._last_t = now.day * 1440 + now.hour * 60 + now.minute
         for job in self.jobs:
             job.run()
 
-    def _callback(self) -> None:
+    def _arm(self) -> None:
+        ''' [internal] schedule one-shot event for next full minute. '''
+        self._event = _scheduler_enter(self._next, self._tick)
+
+    def _wake_soon(self) -> None:
+        ''' [internal] jobs changed, re-evaluate at next full minute. '''
+        with self._lock:
+            soon = (int(time()) // 60 + 1) * 60
+            if not self._event or self._next <= soon:
+                return
+            try:
+                _scheduler.cancel(self._event)
+            except ValueError:
+                return  # currently running, will re-arm after
+            self._next = soon
+            self._arm()
+
+    def _tick(self) -> None:
+        ''' [internal] event callback. Re-arm on fixed wall-clock schedule. '''
+        with self._lock:  # a job may call stop() / start() meanwhile
+            event, at = self._event, self._next
+        try:
+            self._callback(date.fromtimestamp(at))
+        finally:
+            with self._lock:
+                if event and self._event is event:  # not stopped / restarted
+                    self._next = self._next_wakeup(at)
+                    now = time()
+                    if self._next <= now:  # callback took longer than that
+                        self._next = (int(now) // 60 + 1) * 60
+                    self._arm()
+
+    def _next_wakeup(self, last: float) -> float:
+        ''' [internal] absolute time of the next minute with a due job. '''
+        soon = last + 60
+        heap = self._heap
+        if heap is None:  # jobs changed, rebuild on next tick
+            return soon
+        now = date.fromtimestamp(last)
+        if now.day * 1440 + now.hour * 60 + now.minute < self._heap_ts:
+            return soon  # new month, heap is rebuilt on next tick
+        if now.hour in self.sleep:  # nothing happens until the next hour
+            return max(soon, (now.replace(minute=0, second=0, microsecond=0)
+                              + timedelta(hours=1)).timestamp())
+        month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        # minute counter starts over, heap is rebuilt on first of month
+        due = (month + timedelta(days=32)).replace(day=1)
+        if heap:  # minute counter of first day is 1440
+            due = min(due, month + timedelta(minutes=heap[0][0] - 1440))
+        wake = due.timestamp()
+        if date.fromtimestamp(wake) != due:
+            return soon  # wall-clock time skipped by DST, tick per minute
+        return max(soon, wake)
+
+    def _callback(self, now: date) -> None:
         ''' [internal] check if interval matches current time and execute. '''
-        now = date.now()
         if now.hour in self.sleep:
             return
-        # Timer called multiple times per minute. Assures fn is called once.
         ts = now.day * 1440 + now.hour * 60 + now.minute
-        if self._last_t == ts:
+        heap = self._heap
+        # minute counter starts over at the beginning of each month
+        if heap is None or ts < self._heap_ts:
+            heap = self._rebuild_heap(ts)
+        self._heap_ts = ts
+        replace, entry = heapq.heapreplace, self._heap_entry  # local lookup
+        while heap and heap[0][0] <= ts:
+            due, _, job = heap[0]
+            if due < ts:  # missed during sleep hours, reschedule
+                replace(heap, entry(job, ts))
+                continue
+            replace(heap, entry(job, ts + 1))
+            self._run(job)
+
+    def _run(self, job: Job) -> None:
+        ''' [internal] execute job now or submit to thread pool. '''
+        if not self._pool:
+            try:  # other jobs (and other Cron instances) must keep running
+                job.callback(job.object)
+            except Exception as e:
+                print(f'Cron job error: {e!r}', file=stderr)
             return
-        self._last_t = ts
-        for job in self.jobs:
-            job.run(ts)
+        if not job._running.acquire(blocking=False):
+            return  # previous run still in progress, skip this one
+
+        def _fn() -> None:
+            try:
+                job.callback(job.object)
+            except Exception as e:
+                print(f'Cron job error: {e!r}', file=stderr)
+            finally:
+                job._running.release()
+        self._pool.submit(_fn)
+
+    def _heap_entry(self, job: Job, ts: int) -> HeapEntry:
+        ''' [internal] schedule job for next interval match at or after ts. '''
+        return (-(-ts // job.interval) * job.interval, next(self._order), job)
+
+    def _rebuild_heap(self, ts: int) -> List[HeapEntry]:
+        ''' [internal] order jobs by next fire time (incl. current `ts`). '''
+        self._heap = [self._heap_entry(job, ts)
+                      for job in self.jobs if job.interval > 0]
+        heapq.heapify(self._heap)
+        return self._heap
 
     def __str__(self) -> str:
-        return '\n'.join('@{}m {}'.format(job.interval, job.object)
-                         for job in self.jobs)
+        return '\n'.join(f'@{job.interval}m {job.object}' for job in self.jobs)
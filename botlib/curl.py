@@ -1,12 +1,19 @@
 #!/usr/bin/env python3
 import os
+import gzip
 import json
+import shutil  # copyfileobj
 from sys import stderr
-from hashlib import md5
+from time import time, sleep
+from hashlib import blake2b
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.error import HTTPError, URLError
 from urllib.parse import urlparse, ParseResult
 from urllib.request import urlretrieve, urlopen, Request
-from typing import List, Dict, Optional, Any, TextIO
+from typing import List, Tuple, Dict, Set, Optional, Union, Any, TextIO
+from typing import BinaryIO, Iterable
+from threading import Lock, BoundedSemaphore
 from datetime import datetime  # typing
 from http.client import HTTPResponse  # typing
 from .helper import FileTime
@@ -22,35 +29,104 @@ def _read_modified_header(fname: str) -> Dict[str, str]:
         with open(fname) as fp:
             for line in fp.readlines():
                 key, val = line.strip().split(': ', 1)
-                if key == 'Etag' and val:
-                    res['If-None-Match'] = val
-                elif key == 'Last-Modified' and val:
-                    res['If-Modified-Since'] = val.replace('-gzip', '')
+                key = key.lower()  # server may send ETag, Etag, etag, ...
+                if key == 'etag' and val:
+                    # Apache appends -gzip to compressed variants
+                    res['If-None-Match'] = val.replace('-gzip', '')
+                elif key == 'last-modified' and val:
+                    res['If-Modified-Since'] = val
     return res
 
 
+@lru_cache(maxsize=1024)
+def _valid_url(url: str) -> Optional[ParseResult]:
+    ''' Cached, same URLs are requested over and over again (cron jobs). '''
+    url = url.strip().replace(' ', '+')
+    x = urlparse(url)
+    return x if x.scheme and x.netloc else None
+
+
+@lru_cache(maxsize=1024)
+def _url_hash(url: str) -> str:
+    ''' Cached, see `_valid_url()`. '''
+    x = _valid_url(url)
+    host = x.hostname if x else 'ERR'
+    return f'{host}-{blake2b(url.encode(), digest_size=8).hexdigest()}'
+
+
+_host_slots = {}  # type: Dict[str, BoundedSemaphore]
+_host_slots_lock = Lock()
+
+
+def _host_slot(url: str) -> BoundedSemaphore:
+    ''' Shared per host, limits concurrent file downloads. '''
+    x = _valid_url(url)
+    host = x.netloc if x else ''
+    with _host_slots_lock:
+        slot = _host_slots.get(host)
+        if not slot:
+            slot = _host_slots[host] = BoundedSemaphore(Curl.MAX_PER_HOST)
+        return slot
+
+
+class _TeeReader:
+    ''' [internal] Read (decompressed) response and copy it to dest file. '''
+
+    def __init__(self, conn: HTTPResponse, dest: str) -> None:
+        self._conn = conn
+        self._src = conn  # type: Union[HTTPResponse, gzip.GzipFile]
+        if conn.headers.get('Content-Encoding') == 'gzip':
+            self._src = gzip.GzipFile(fileobj=conn)
+        self._dest = dest
+        self._fp = open(dest + '.inprogress', 'wb')
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._src.read(size)
+        if data:
+            self._fp.write(data)
+        elif not self._fp.closed:  # EOF, download complete
+            self._fp.close()
+            os.replace(self._fp.name, self._dest)
+            # only now, else a 304 would refer to a missing / partial file
+            with open(self._dest[:-5] + '.head', 'w') as fp:
+                fp.write(str(self._conn.info()).strip())
+        return data
+
+    def close(self) -> None:
+        if not self._fp.closed:  # closed before EOF, discard partial file
+            self._fp.close()
+            os.remove(self._fp.name)
+        self._conn.close()
+
+    def __enter__(self) -> '_TeeReader':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
 class Curl:
     ''' Rename Curl.CACHE_DIR to move the cache somewhere else. '''
     CACHE_DIR = 'cache'
+    MAX_PER_HOST = 2  # concurrent file() downloads from the same host
 
     @staticmethod
     def valid_url(url: str) -> Optional[ParseResult]:
         ''' If valid, return urlparse() result. '''
-        url = url.strip().replace(' ', '+')
-        x = urlparse(url)
-        return x if x.scheme and x.netloc else None
+        return _valid_url(url)
 
     @staticmethod
     def url_hash(url: str) -> str:
         ''' Unique url-hash used for filename / storage. '''
-        x = Curl.valid_url(url)
-        return '{}-{}'.format(x.hostname if x else 'ERR',
-                              md5(url.encode()).hexdigest())
+        return _url_hash(url)
 
     @staticmethod
     def _cached_is_recent(fname: str, *, maxAge: int) -> bool:
-        fname = os.path.join(Curl.CACHE_DIR, fname)
-        return os.path.isfile(fname) and FileTime.get(fname) < maxAge
+        try:
+            mtime = os.stat(os.path.join(Curl.CACHE_DIR, fname)).st_mtime
+        except FileNotFoundError:
+            return False
+        return time() - mtime < maxAge
 
     @staticmethod
     def _cached_read(
@@ -61,13 +137,15 @@ class Curl:
             os.makedirs(Curl.CACHE_DIR, exist_ok=True)
             with open(os.path.join(Curl.CACHE_DIR, fname_head), 'w') as fp:
                 fp.write(str(conn.info()).strip())
+            src = conn  # type: Union[HTTPResponse, gzip.GzipFile]
+            if conn.headers.get('Content-Encoding') == 'gzip':
+                src = gzip.GzipFile(fileobj=conn)  # store decompressed
             with open(fname_data, 'wb') as fpb:
-                while True:
-                    data = conn.read(8192)  # 1024 Bytes
-                    if not data:
-                        break
-                    fpb.write(data)
-        return open(fname_data) if os.path.isfile(fname_data) else None
+                shutil.copyfileobj(src, fpb, 1048576)  # 1 MB chunks
+        try:
+            return open(fname_data)
+        except FileNotFoundError:
+            return None
 
     @staticmethod
     def open(
@@ -77,41 +155,153 @@ class Curl:
         headers: Optional[Dict[str, str]] = None,
     ) -> Optional[HTTPResponse]:
         ''' Open a network connection, returl urlopen() result or None. '''
+        return Curl._open(url, post=post, headers=headers)[0]
+
+    @staticmethod
+    def _open(
+        url: str,
+        *,
+        post: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Tuple[Optional[HTTPResponse], bool]:
+        ''' Same as `open()` but also return True if 304 Not-Modified. '''
         try:
             head = {'User-Agent': 'Mozilla/5.0'}
             if headers:
                 head.update(headers)
-            return urlopen(Request(url, data=post, headers=head))
+            return urlopen(Request(url, data=post, headers=head)), False
         except Exception as e:
             if isinstance(e, HTTPError) and e.getcode() == 304:
-                # print('Not-Modified: {}'.format(url), file=stderr)
-                return None  # ignore not-modified
-            print('ERROR: Load URL "{}" -- {}'.format(url, e), file=stderr)
-            return None
+                # print(f'Not-Modified: {url}', file=stderr)
+                return None, True  # ignore not-modified
+            print(f'ERROR: Load URL "{url}" -- {e}', file=stderr)
+            return None, False
 
     @staticmethod
     def get(
         url: str,
         *,
         cache_only: bool = False,
+        only_modified: bool = False,
+        max_age: int = 45,
         headers: Optional[Dict[str, str]] = None,
+        since: Optional[str] = None,
     ) -> Optional[TextIO]:
         '''
         Returns an already open file pointer.
         You are responsible for closing the file.
         NOTE: `HTML2List.parse` and `Feed2List.parse` will close it for you.
+        If `only_modified` is set, return None if the server responds with
+        304 Not-Modified (content did not change since the last request).
+        Responses younger than `max_age` (sec) are served from cache without
+        a request. Older ones are revalidated with ETag / Last-Modified.
+        If `since` is set (see `validator()`), revalidate against that state
+        instead of the last request. `''` forces a full download.
         '''
-        fname = 'curl-{}.data'.format(Curl.url_hash(url))
-        # If file was created less than 45 sec ago, reuse cached value
-        if cache_only or Curl._cached_is_recent(fname, maxAge=45):
+        fname = f'curl-{Curl.url_hash(url)}.data'
+        # If file was created less than max_age sec ago, reuse cached value
+        if cache_only or Curl._cached_is_recent(fname, maxAge=max_age):
             return Curl._cached_read(None, fname, '')
 
-        fname_head = fname[:-5] + '.head'
-        head = _read_modified_header(fname_head)
+        conn, not_modified = Curl._conditional_open(
+            url, fname, headers, since)
+        if not_modified and only_modified:
+            return None
+        return Curl._cached_read(conn, fname, fname[:-5] + '.head')
+
+    @staticmethod
+    def _conditional_open(
+        url: str,
+        fname: str,
+        headers: Optional[Dict[str, str]],
+        since: Optional[str] = None,
+    ) -> Tuple[Optional[HTTPResponse], bool]:
+        ''' [internal] GET with Etag / Last-Modified of cached `fname`. '''
+        if since is None:
+            fname_head = os.path.join(Curl.CACHE_DIR, fname[:-5] + '.head')
+            head = _read_modified_header(fname_head)
+        else:
+            head = json.loads(since) if since else {}
+        head['Accept-Encoding'] = 'gzip'
         if headers:
             head.update(headers)
-        conn = Curl.open(url, headers=head)
-        return Curl._cached_read(conn, fname, fname_head)
+        conn, not_modified = Curl._open(url, headers=head)
+        if not_modified:
+            try:  # still valid, restart max_age cache
+                os.utime(os.path.join(Curl.CACHE_DIR, fname))
+            except FileNotFoundError:
+                pass
+        return conn, not_modified
+
+    @staticmethod
+    def validator(url: str) -> str:
+        '''
+        ETag / Last-Modified of the last downloaded content of `url`.
+        Call it right after `get()` and store it once the content is
+        processed. Pass it as `since` on the next `get()` to skip content
+        which did not change since then (with `only_modified`).
+        '''
+        fname = f'curl-{Curl.url_hash(url)}.head'
+        return json.dumps(
+            _read_modified_header(os.path.join(Curl.CACHE_DIR, fname)),
+            sort_keys=True)
+
+    @staticmethod
+    def stream(
+        url: str,
+        *, max_age: int = 45,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Optional[BinaryIO]:
+        '''
+        Same as `get()` but return (binary) content while it is downloaded,
+        e.g., to start `HTML2List.parse` before the download is complete.
+        The cache file is written alongside and is only stored if the
+        content was read completely.
+        '''
+        fname = f'curl-{Curl.url_hash(url)}.data'
+        path = os.path.join(Curl.CACHE_DIR, fname)
+        if not Curl._cached_is_recent(fname, maxAge=max_age):
+            conn, _ = Curl._conditional_open(url, fname, headers)
+            if conn:
+                os.makedirs(Curl.CACHE_DIR, exist_ok=True)
+                return _TeeReader(conn, path)  # type: ignore
+        try:
+            return open(path, 'rb')
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def get_many(
+        urls: Iterable[str],
+        *, max_workers: int = 4,
+        host_delay: float = 1.0,
+        since: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> List[Optional[TextIO]]:
+        '''
+        Same as `get()` for many urls. Return results in order of `urls`.
+        Different hosts are requested in parallel. Requests to the same host
+        are made one after another, with `host_delay` sec in between.
+        `since` is a list with one `get(since=)` value per url.
+        '''
+        todo = list(urls)
+        res = [None] * len(todo)  # type: List[Optional[TextIO]]
+        by_host = {}  # type: Dict[str, List[int]]
+        for i, url in enumerate(todo):
+            x = Curl.valid_url(url)
+            by_host.setdefault(x.netloc if x else '', []).append(i)
+
+        def _fn(indices: List[int]) -> None:
+            for n, i in enumerate(indices):
+                if n:
+                    sleep(host_delay)  # be polite
+                res[i] = Curl.get(
+                    todo[i], since=since[i] if since else None, **kwargs)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for _ in pool.map(_fn, by_host.values()):
+                pass  # wait for all, raise exceptions
+        return res
 
     @staticmethod
     def post(
@@ -126,11 +316,14 @@ class Curl:
         Returns an already open file pointer.
         You are responsible for closing the file.
         '''
-        fname = 'curl-{}.post.data'.format(Curl.url_hash(url))
+        fname = f'curl-{Curl.url_hash(url)}.post.data'
         if cache_only:
             return Curl._cached_read(None, fname, '')
 
-        conn = Curl.open(url, post=data, headers=headers)
+        head = {'Accept-Encoding': 'gzip'}
+        if headers:
+            head.update(headers)
+        conn = Curl.open(url, post=data, headers=head)
         return Curl._cached_read(conn, fname, fname[:-5] + '.head')
 
     @staticmethod
@@ -148,14 +341,16 @@ class Curl:
         '''
         Download raw data to file. Creates an intermediate ".inprogress" file.
         If raise_except = False, silently ignore errors (default).
+        At most `MAX_PER_HOST` downloads per host run at the same time.
         '''
         tmp_file = dest_file + '.inprogress'
         try:
-            urlretrieve(url, tmp_file)
-            os.rename(tmp_file, dest_file)  # atomic download, no broken files
+            with _host_slot(url):  # be polite, even if called from threads
+                urlretrieve(url, tmp_file)
+            os.replace(tmp_file, dest_file)  # atomic download, no broken files
             return True
         except HTTPError as e:
-            # print('ERROR: Load URL "{}" -- {}'.format(url, e), file=stderr)
+            # print(f'ERROR: Load URL "{url}" -- {e}', file=stderr)
             if raise_except:
                 raise e
             return False
@@ -178,23 +373,35 @@ class Curl:
         If `date` is set, change last modified date of downloaded file.
         Print `intro` before download (if any loaded or if `override`).
         '''
-        did_update = False
+        downloads = []  # type: List[Tuple[str, str]]
+        seen = set()  # type: Set[str]
         for url_str in urllist:
             parts = Curl.valid_url(url_str)
             if not parts:
-                raise URLError('URL not valid: "{}"'.format(url_str))
+                raise URLError(f'URL not valid: "{url_str}"')
 
             ext = parts.path.split('.')[-1] or 'unknown'
             file_path = os.path.join(dest_dir, fname + '.' + ext)
+            if file_path in seen:
+                continue  # same file listed twice, first one wins
+            seen.add(file_path)
             if override or not os.path.isfile(file_path):
                 url = parts.geturl()
                 if verbose:
-                    if not did_update and intro:
+                    if not downloads and intro:
                         print(intro)
                     print('  GET', url)
-                did_update = True
-                if not dry_run:
-                    Curl.file(url, file_path, raise_except=True)
-                    if date:
-                        FileTime.set(file_path, date)
-        return did_update
+                downloads.append((url, file_path))
+
+        def _download(url: str, file_path: str) -> None:
+            Curl.file(url, file_path, raise_except=True)
+            if date:
+                FileTime.set(file_path, date)
+
+        if downloads and not dry_run:
+            # network bound, download all files in parallel
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                for future in as_completed([pool.submit(_download, *x)
+                                            for x in downloads]):
+                    future.result()  # re-raise download errors
+        return len(downloads) > 0
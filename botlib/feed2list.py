@@ -1,67 +1,112 @@
 #!/usr/bin/env python3
 import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional, Union, TextIO, BinaryIO
+from typing import Iterable, Iterator, Tuple, FrozenSet
+from .curl import Curl
 from .helper import StrFormat
 
+_MISSING = object()
+
+
+def _iter_entries(file: Union[TextIO, BinaryIO]) \
+        -> Iterator[Tuple[ET.Element, FrozenSet[str]]]:
+    '''
+    Stream-parse feed and yield (entry, date_fields) tuples.
+    Namespace URIs are replaced with their prefix, e.g., `media:content`.
+    Entries are removed from the tree after processing (bounded memory).
+    '''
+    ns = {}
+    tags = {}  # type: Dict[str, str] # raw tag -> prefixed tag
+    stack = []  # type: List[ET.Element]
+    depth = 0  # nesting level of entries: rss/channel/item or feed/entry
+    for event, elem in ET.iterparse(file, ('start-ns', 'start', 'end')):
+        if event == 'start-ns':
+            ns['{' + elem[1] + '}'] = elem[0] + ':' if elem[0] else ''
+            tags.clear()  # prefix may have changed
+        elif event == 'start':
+            raw = elem.tag
+            tag = tags.get(raw)
+            if tag is None:
+                uri, sep, tag = raw.rpartition('}')
+                if sep:
+                    tag = ns[uri + sep] + tag
+                tags[raw] = tag
+            elem.tag = tag
+            if not stack:  # detect feed format (RSS / Atom)
+                if elem.tag == 'rss':  # RSS
+                    depth, entry_tag = 2, 'item'
+                    date_fields = frozenset(['pubDate', 'lastBuildDate'])
+                elif elem.tag == 'feed':  # Atom
+                    depth, entry_tag = 1, 'entry'
+                    date_fields = frozenset(['updated', 'published'])
+                else:
+                    raise NotImplementedError('Unrecognizable feed format')
+            stack.append(elem)
+        else:  # end
+            stack.pop()
+            if len(stack) == depth and elem.tag == entry_tag:
+                yield elem, date_fields
+                stack[-1].remove(elem)
+
 
 def Feed2List(
     fp: Optional[Union[TextIO, BinaryIO]],
     *, keys: Optional[List[str]] = None
 ) -> List[Dict[str, Any]]:
     ''' Parse RSS or Atom feed and return list of entries. '''
-    def parse_without_namespace(file: Union[TextIO, BinaryIO]) -> ET.Element:
-        ns = {}
-        xml_iter = ET.iterparse(file, ('start-ns', 'start'))
-        for event, elem in xml_iter:
-            if event == 'start-ns':
-                ns['{' + elem[1]] = elem[0] + ':' if elem[0] else ''
-            elif event == 'start':
-                tag = elem.tag.split('}')
-                elem.tag = ''.join(ns[x] for x in tag[:-1]) + tag[-1]
-        return xml_iter.root
-
     if not fp:
         return []
-    # detect feed format (RSS / Atom)
-    root = parse_without_namespace(fp)
-    fp.close()
-    if root.tag == 'rss':  # RSS
-        selector = 'channel/item'
-        date_fields = ['pubDate', 'lastBuildDate']
-    elif root.tag == 'feed':  # Atom
-        selector = 'entry'
-        date_fields = ['updated', 'published']
-    else:
-        raise NotImplementedError('Unrecognizable feed format')
 
-    # parse XML
+    keys_set = frozenset(keys) if keys else None
+    to_date = StrFormat.to_date  # local lookup in inner loop
     result = []
-    for item in root.findall(selector):
-        obj = {}  # type: Dict[str, Any]
-        for child in item:
-            tag = child.tag
-            # Filter keys that are clearly not wanted by user
-            if keys and tag not in keys:
-                continue
-            value = (child.text or '').strip()
-            # For date-fields, create and return date
-            if tag in date_fields:
-                value = StrFormat.to_date(value)
-            # Return dict if has attributes or string without attribs
-            attr = child.attrib
-            if attr:
-                if value:
-                    attr[''] = value
-                value = attr
-            # Auto-create list type if duplicate keys are used
-            try:
-                prev_val = obj[tag]
-                if not isinstance(prev_val, list):
-                    obj[tag] = [prev_val]
-                obj[tag].append(value)
-            except KeyError:
-                obj[tag] = value
-        # Each entry has a key-value-dict. Value may be string or attrib-dict.
-        # Value may also be a list of mixed string and attrib-dict values.
-        result.append(obj)
+    try:
+        for item, date_fields in _iter_entries(fp):
+            obj = {}  # type: Dict[str, Any]
+            obj_get = obj.get
+            for child in item:
+                tag = child.tag
+                # Filter keys that are clearly not wanted by user
+                if keys_set is not None and tag not in keys_set:
+                    continue
+                value = (child.text or '').strip()
+                # For date-fields, create and return date
+                if tag in date_fields:
+                    value = to_date(value)
+                # Return dict if has attributes or string without attribs
+                attr = child.attrib
+                if attr:
+                    if value:
+                        attr[''] = value
+                    value = attr
+                # Auto-create list type if duplicate keys are used
+                prev_val = obj_get(tag, _MISSING)
+                if prev_val is _MISSING:
+                    obj[tag] = value
+                elif isinstance(prev_val, list):
+                    prev_val.append(value)
+                else:
+                    obj[tag] = [prev_val, value]
+            # Each entry has a key-value-dict. Value may be string or dict.
+            # Value may also be a list of mixed string and attrib-dict values.
+            result.append(obj)
+    finally:
+        fp.close()
     return result
+
+
+def Feed2ListMany(
+    urls: Iterable[str],
+    *, keys: Optional[List[str]] = None,
+    max_workers: int = 8
+) -> List[List[Dict[str, Any]]]:
+    '''
+    Download and parse multiple feeds concurrently (`Curl.get` + `Feed2List`).
+    Return one list of entries per url (same order as `urls`).
+    '''
+    def _fn(url: str) -> List[Dict[str, Any]]:
+        return Feed2List(Curl.get(url), keys=keys)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(_fn, urls))
@@ -2,44 +2,60 @@
 import re
 import os  # utime, getmtime
 import time  # mktime, time
+import atexit  # register
 import traceback  # format_exc
 from sys import stderr
 from html import unescape
 from datetime import datetime
 import unicodedata  # normalize
 from string import ascii_letters, digits
-from typing import Optional, Callable, Union
+from typing import Optional, Callable, Union, Match, Dict, Set, TextIO
 
 
 class Log:
     FILE = 'error.log'
     LEVEL = 0  # -1: disabled, 0: error, 1: warn, 2: info, 4: debug
+    _fp = None  # type: Optional[TextIO] # kept open, line-buffered
 
     @staticmethod
     def _log_if(level: int, msg: str) -> None:
         ''' Log to file if LOG_LEVEL >= level. '''
         if Log.LEVEL >= level:
-            with open(Log.FILE, 'a') as fp:
-                fp.write(msg + '\n')
+            fp = Log._fp
+            if not fp or fp.name != Log.FILE:  # first call or FILE changed
+                Log._close()
+                fp = Log._fp = open(Log.FILE, 'a', buffering=1)
+            fp.write(msg + '\n')
+
+    @staticmethod
+    def _close() -> None:
+        ''' [internal] Close log file. Called automatically on exit. '''
+        if Log._fp:
+            Log._fp.close()
+            Log._fp = None
 
     @staticmethod
     def error(e: Union[str, Exception]) -> None:
         ''' Log error message (incl. current timestamp) '''
-        msg = '{} [ERROR] {}'.format(
-            datetime.now(), e if isinstance(e, str) else repr(e))
+        txt = e if isinstance(e, str) else repr(e)
+        msg = f'{datetime.now()} [ERROR] {txt}'
         print(msg, file=stderr)
-        Log._log_if(0, msg)
-        if isinstance(e, Exception):
-            Log._log_if(0, traceback.format_exc())
+        if Log.LEVEL >= 0:
+            Log._log_if(0, msg)
+            if isinstance(e, Exception):
+                Log._log_if(0, traceback.format_exc())
 
     @staticmethod
     def info(m: str) -> None:
         ''' Log info message (incl. current timestamp) '''
-        msg = '{} {}'.format(datetime.now(), m)
+        msg = f'{datetime.now()} {m}'
         print(msg)
         Log._log_if(2, msg)
 
 
+atexit.register(Log._close)
+
+
 class FileTime:
     @staticmethod
     def set(fname: str, date: datetime) -> None:
@@ -55,54 +71,121 @@ class FileTime:
 
 
 class StrFormat:
-    re_img = re.compile(r'<img [^>]*?(?:alt="([^"]*?)"[^>]*)?'
-                        r'src="([^"]*?)"(?:[^>]*?alt="([^"]*?)")?[^>]*?/>')
-    re_href = re.compile(r'<a [^>]*href="([^"]*?)"[^>]*?>(.*?)</a>')
-    re_br = re.compile(r'<br[^>]*>|</p>')
-    re_tags = re.compile(r'<[^>]*>')
+    # single pass: img, a-href, br, any other tag (first match wins)
+    re_html = re.compile(
+        r'<img [^>]*?(?:alt="(?P<alt1>[^"]*?)"[^>]*)?src="(?P<src>[^"]*?)"'
+        r'(?:[^>]*?alt="(?P<alt2>[^"]*?)")?[^>]*?/>'
+        r'|<a [^>]*href="(?P<href>[^"]*?)"[^>]*?>'
+        r'(?P<text>(?:<img [^>]*/>|(?!<a ).)*?)</a>'  # no nested anchors
+        r'|(?P<br><br[^>]*>|</p>)'
+        r'|<[^<>]*>')
     re_crlf = re.compile(r'[\n\r]{2,}')
 
+    @staticmethod
+    def _html_repl(match: Match[str]) -> str:
+        ''' [internal] replacement for a single `re_html` match. '''
+        if match['src'] is not None:
+            return '[IMG: {}, {}{}]'.format(
+                match['src'], match['alt1'] or '', match['alt2'] or '')
+        if match['href'] is not None:
+            text = StrFormat.re_html.sub(StrFormat._html_repl, match['text'])
+            return '{} ({})'.format(text, match['href'])
+        return '\n' if match['br'] else ''
+
     @staticmethod
     def strip_html(text: str) -> str:
         '''
         Remove all html tags and replace with readble alternative.
         Also, strips unnecessary newlines, nbsp, br, etc.
         '''
-        text = StrFormat.re_img.sub(r'[IMG: \2, \1\3]', text)
-        text = StrFormat.re_href.sub(r'\2 (\1)', text)
-        text = StrFormat.re_br.sub('\n', text)
-        text = StrFormat.re_tags.sub('', text)
+        if '<' in text:  # skip regex for plain text
+            text = StrFormat.re_html.sub(StrFormat._html_repl, text)
         text = StrFormat.re_crlf.sub('\n\n', text)
         return unescape(text).replace(' ', ' ').strip()
 
+    date_formats = (
+        '%a, %d %b %Y %H:%M:%S %z',  # RSS
+        '%Y-%m-%dT%H:%M:%S%z',  # Atom
+        '%Y-%m-%dT%H:%M:%S.%f%z',  # Atom
+        '%Y-%m-%dT%H:%M:%S',  # without timezone
+        '%Y-%m-%dT%H:%M:%S.%f'  # without timezone
+    )
+
+    @staticmethod
+    def _guess_date_format(text: str) -> Optional[str]:
+        ''' [internal] pick format by shape of string (avoid ValueError). '''
+        if text[3:4] == ',':
+            return StrFormat.date_formats[0]
+        if text[10:11] != 'T':
+            return None
+        rest = text[19:]
+        frac = rest[:1] == '.'
+        if frac:
+            rest = rest[1:].lstrip(digits)
+        if rest:  # has timezone
+            return StrFormat.date_formats[2 if frac else 1]
+        return StrFormat.date_formats[4 if frac else 3]
+
     @staticmethod
     def to_date(text: str) -> datetime:
         ''' Try parse string as date, currently RSS + Atom format. '''
-        for date_format in (
-            '%a, %d %b %Y %H:%M:%S %z',  # RSS
-            '%Y-%m-%dT%H:%M:%S%z',  # Atom
-            '%Y-%m-%dT%H:%M:%S.%f%z',  # Atom
-            '%Y-%m-%dT%H:%M:%S',  # without timezone
-            '%Y-%m-%dT%H:%M:%S.%f'  # without timezone
-        ):
+        guess = StrFormat._guess_date_format(text)
+        if guess:
+            try:
+                return datetime.strptime(text, guess)
+            except ValueError:
+                pass
+        for date_format in StrFormat.date_formats:
+            if date_format == guess:
+                continue
             try:
                 return datetime.strptime(text, date_format)
             except ValueError:
                 pass
         raise ValueError('Could not match date format. {}'.format(text))
 
-    fnameChars = set('-_.,() {}{}'.format(ascii_letters, digits))
+    fnameChars = frozenset('-_.,() {}{}'.format(ascii_letters, digits))
+    # all bytes not in fnameChars, used with bytes.translate()
+    _fnameDelete = bytes(sorted(set(range(256)) - set(map(ord, fnameChars))))
+    # applied after NFKD normalization, which splits umlauts in two chars
+    _fnameUmlauts = str.maketrans({
+        '\u0308': 'e',  # combining diaeresis, e.g., Ä -> Ae
+    })
 
     @staticmethod
     def safe_filename(text: str) -> str:
         ''' Replace umlauts and unsafe characters (filesystem safe). '''
+        if StrFormat.fnameChars.issuperset(text):
+            return text  # already safe, nothing to normalize or remove
         text = unicodedata.normalize('NFKD', text)  # makes 2-bytes of umlauts
-        text = text.replace('̈', 'e')  # replace umlauts e.g., Ä -> Ae
+        text = text.translate(StrFormat._fnameUmlauts)
         data = text.encode('ASCII', 'ignore')
-        return ''.join(chr(c) for c in data if chr(c) in StrFormat.fnameChars)
+        return data.translate(None, StrFormat._fnameDelete).decode('ASCII')
 
 
 class FileWrite:
+    _existing = {}  # type: Dict[str, Set[str]] # dir -> filenames
+
+    @staticmethod
+    def _exists(path: str) -> bool:
+        ''' [internal] Lookup file in cached directory listing. '''
+        dir_name, fname = os.path.split(path)
+        try:
+            files = FileWrite._existing[dir_name]
+        except KeyError:
+            try:
+                with os.scandir(dir_name or '.') as it:
+                    files = {x.name for x in it if x.is_file()}
+            except FileNotFoundError:
+                return False  # do not cache, may be created later
+            FileWrite._existing[dir_name] = files
+        return fname in files
+
+    @staticmethod
+    def clear_cache() -> None:
+        ''' Call if files were deleted since the last `once()` call. '''
+        FileWrite._existing.clear()
+
     @staticmethod
     def once(
         dest_dir: str,
@@ -117,10 +200,11 @@ class FileWrite:
         Write file to disk – but only if it does not exist already.
         The callback method is only called if the file does not exist yet.
         Use as decorator to a function: @FileWrite.once(...)
+        Directory listings are cached, see `clear_cache()`.
         '''
         def _decorator(func: Callable[[], Optional[str]]) -> None:
             path = os.path.join(dest_dir, fname)
-            if os.path.isfile(path) and not override:
+            if not override and FileWrite._exists(path):
                 return
             content = func()
             if not content:
@@ -136,4 +220,7 @@ class FileWrite:
                 f.write(content)
             if date:
                 FileTime.set(path, date)
+            dir_name, name = os.path.split(path)
+            if dir_name in FileWrite._existing:
+                FileWrite._existing[dir_name].add(name)
         return _decorator
@@ -1,11 +1,18 @@
 #!/usr/bin/env python3
+import os
 import re
 import json
+import codecs  # getincrementaldecoder
 from sys import stderr
 from argparse import ArgumentParser, FileType
 from typing import List, Tuple, Dict, Optional, Union, Callable
 from typing import TextIO, BinaryIO, Iterator, KeysView
+from functools import lru_cache
 from html.parser import HTMLParser
+try:
+    from re import _parser as sre_parse  # type: ignore[attr-defined]
+except ImportError:  # Python < 3.11
+    import sre_parse  # type: ignore[no-redef]
 
 XMLAttrs = List[Tuple[str, Optional[str]]]
 
@@ -18,16 +25,16 @@ class CSSSelector:
             raise NotImplementedError(
                 'No support for nested tags. "{}"'.format(selector))
         self.tag, *self.cls = selector.split('.')
+        self._cls = frozenset(self.cls)
 
     def matches(self, tag: str, attrs: XMLAttrs) -> bool:
         ''' Test if tag and attrs match the target selector. '''
         if self.tag and tag != self.tag:
             return False
-        if self.cls:
+        if self._cls:
             for k, val in attrs:
                 if k == 'class' and val:
-                    classes = val.split()
-                    return all(x in classes for x in self.cls)
+                    return self._cls.issubset(val.split())
             return False
         return True
 
@@ -46,85 +53,136 @@ class HTML2List(HTMLParser):
     ) -> None:
         super().__init__()
         self._filter = CSSSelector(select)
-        self._data = ''  # temporary data built-up
-        self._elem = []  # type: List[str] # tag stack
-        self._tgt = 0  # remember matching level for filter
+        self._data = []  # type: List[str] # temporary data built-up
+        self._elem = []  # type: List[str] # tag stack inside matching element
+        self._found = []  # type: List[str] # matches not yet yielded
         self._result = []  # type: List[str] # empty if callback
         self._callback = callback or self._result.append
 
+    CHUNK_SIZE = 65536  # 64k, default read size (e.g., network sources)
+
+    @staticmethod
+    def _chunk_size(source: Union[TextIO, BinaryIO]) -> int:
+        ''' Read size for `source`. Larger for local files (fewer syscalls) '''
+        chunk = HTML2List.CHUNK_SIZE
+        try:
+            # st_blksize is the preferred I/O size (typically 4k) -> 64k-1M
+            blksize = os.fstat(source.fileno()).st_blksize
+            chunk = min(max(chunk, blksize * 16), 1 << 20)
+        except Exception:
+            pass  # no real file descriptor (e.g., BytesIO)
+        return chunk
+
     def parse(self, source: Optional[Union[TextIO, BinaryIO]]) -> List[str]:
         '''
         :source: A file-pointer or web-source with read() attribute.
         Warning: return value empty if callback is set!
         '''
-        def rb2str(data: bytes, fp: BinaryIO, limit: int = 256) -> str:
-            try:
-                return data.decode('utf-8')
-            except UnicodeDecodeError:
-                extra = fp.read(limit)
-                if not extra:
-                    return data  # type: ignore[return-value]
-                return rb2str(data + extra, fp, limit)
+        for elem in self.iter(source):
+            self._callback(elem)
+        return self._result
 
+    def iter(self, source: Optional[Union[TextIO, BinaryIO]]) \
+            -> Iterator[str]:
+        '''
+        Same as `parse()` but yield matches while reading `source`.
+        Ignores callback. Stop early to skip reading the remaining source.
+        '''
         if not source:
-            return []
-
-        while True:
-            try:
-                data = source.read(65536)  # 64k
-                if not data:
+            return
+        # multi-byte characters may be split across chunk boundaries
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        chunk = self._chunk_size(source)
+        try:
+            while True:
+                try:
+                    data = source.read(chunk)
+                    if not data:
+                        break
+                except Exception as e:
+                    print('ERROR: {}'.format(e), file=stderr)
                     break
-            except Exception as e:
-                print('ERROR: {}'.format(e), file=stderr)
-                break
-            if isinstance(data, bytes):
-                data = rb2str(data, source)  # type: ignore[arg-type]
-            self.feed(data)
-        source.close()
-        self.close()
-        return self._result
+                if isinstance(data, bytes):
+                    data = decoder.decode(data)
+                self.feed(data)
+                yield from self._flush()
+            self.feed(decoder.decode(b'', final=True))
+            self.close()
+            yield from self._flush()
+        finally:
+            source.close()
+
+    def _flush(self) -> List[str]:
+        ''' [internal] Return and reset found matches. '''
+        found, self._found = self._found, []
+        return found
 
     def handle_starttag(self, tag: str, attrs: XMLAttrs) -> None:
         ''' [internal] HTMLParser callback '''
-        self._elem.append(tag)
         if self._filter.matches(tag, attrs):
-            if self._tgt > 0:
+            if self._elem:
                 raise RuntimeError('No nested tags! Adjust your filter.')
-            self._tgt = len(self._elem) - 1
-        if self._tgt > 0:
-            self._data += self.get_starttag_text() or ''
+        elif not self._elem:
+            return  # outside of matching element
+        self._elem.append(tag)
+        self._data.append(self.get_starttag_text() or '')
 
     def handle_startendtag(self, tag: str, attrs: XMLAttrs) -> None:
         ''' [internal] HTMLParser callback '''
-        self._elem.append(tag)
-        if self._tgt > 0:
-            self._data += self.get_starttag_text() or ''
+        if self._elem:
+            self._elem.append(tag)
+            self._data.append(self.get_starttag_text() or '')
 
     def handle_data(self, data: str) -> None:
         ''' [internal] HTMLParser callback '''
-        if self._tgt > 0:
-            self._data += data
+        if self._elem:
+            self._data.append(data)
 
     def handle_endtag(self, tag: str) -> None:
         ''' [internal] HTMLParser callback '''
-        if self._tgt > 0:
-            self._data += '</{}>'.format(tag)
-        # drop any non-closed tags
-        while self._elem[-1] != tag:
-            self._elem.pop(-1)  # e.g., <img> which is not start-end-type
-        self._elem.pop(-1)  # remove actual closing tag
-        # if level matches search-level, yield whole element
-        if len(self._elem) == self._tgt:
-            self._tgt = 0
-            if self._data:
-                # print('DEBUG:', self._data)
-                self._callback(self._data)
-                self._data = ''
+        if not self._elem:
+            return  # outside of matching element
+        self._data.append('</{}>'.format(tag))
+        if tag not in self._elem:
+            return  # ignore stray closing tag
+        # drop any non-closed tags, e.g., <img> which is not start-end-type
+        while self._elem.pop() != tag:
+            pass
+        # if matching element is closed, yield whole element
+        if not self._elem:
+            text = ''.join(self._data)
+            self._data.clear()
+            if text:
+                # print('DEBUG:', text)
+                self._found.append(text)
+
+
+def _required_literal(regex: str) -> str:
+    ''' Longest literal substring which must be part of every match. '''
+    best = ''
+    run = []  # type: List[str]
+
+    def _walk(items: 'sre_parse.SubPattern') -> None:
+        nonlocal best
+        for op, av in items:
+            if op is sre_parse.LITERAL:
+                run.append(chr(av))
+                continue
+            if op is sre_parse.SUBPATTERN and not av[1] & re.IGNORECASE:
+                _walk(av[-1])  # group content is required as well
+                continue
+            if len(run) > len(best):
+                best = ''.join(run)
+            run.clear()
+
+    _walk(sre_parse.parse(regex))
+    return ''.join(run) if len(run) > len(best) else best
 
 
 class Grep:
     '''
-    Use `[\\s\\S]*?` to match multi-line content.
+    Use `(?s)` and `.*?` to match multi-line content.
+    (Same as, but faster than, `[\\s\\S]*?`)
     Will replace all continuous whitespace (incl. newline) with a single space.
     If you whish to keep whitespace, set cleanup to False.
     '''
@@ -133,9 +191,14 @@ class Grep:
     def __init__(self, regex: str, *, cleanup: bool = True) -> None:
         self.cleanup = cleanup
         self._rgx = re.compile(regex)
+        # cheap substring test to skip regex search if it can't match
+        self._anchor = '' if self._rgx.flags & re.IGNORECASE \
+            else _required_literal(regex)
 
     def find(self, text: str) -> Optional[str]:
         ''' Perform regex search to find desired snippet. '''
+        if self._anchor not in text:
+            return None
         grp = self._rgx.search(text)
         if not grp:
             return None
@@ -204,7 +267,27 @@ class MatchGroup(dict):
 
     def use_template(self, template: str) -> str:
         ''' Use {#tagname#} to replace values with regex value. '''
-        return self.re_tag.sub(lambda x: self[x.groups()[0]] or '', template)
+        if '{#' not in template:
+            return template
+        return MatchGroup.compile_template(template)(self)
+
+    @staticmethod
+    @lru_cache(maxsize=32)
+    def compile_template(template: str) -> Callable[['MatchGroup'], str]:
+        '''
+        Parse {#tagname#} template once, return render function.
+        E.g., `fn = MatchGroup.compile_template(tpl)` then `fn(match)`.
+        '''
+        parts = MatchGroup.re_tag.split(template)
+        literals, keys = parts[0::2], parts[1::2]  # split() alternates
+
+        def _render(match: 'MatchGroup') -> str:
+            res = [literals[0]]
+            for key, literal in zip(keys, literals[1:]):
+                res.append(match[key] or '')
+                res.append(literal)
+            return ''.join(res)
+        return _render
 
 
 def _cli() -> None:
@@ -231,9 +314,10 @@ def _cli() -> None:
             exit(1)
     # parse
     if args.template:
+        render = MatchGroup.compile_template(args.template)
         try:
             for x in HTML2List(args.selector).parse(args.FILE):
-                print(grp.set_html(x).use_template(args.template))
+                print(render(grp.set_html(x)))
         except KeyError as e:
             print('Did you forget a tagname? ' + str(e), file=stderr)
     else:
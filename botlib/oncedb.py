@@ -7,17 +7,61 @@ Usage: Load existing `OnceDB()` and `put(cohort, uid, obj)` new entries.
        Call `mark_done(rowid)` to not process an item again.
 
        Once in a while call `cleanup()` to remove old entries.
+
+       The db can be shared between threads. Use `with OnceDB(...) as db:`
+       or call `close()` to release the connection.
 '''
+import os
+import atexit  # register
 import sqlite3
-from typing import Tuple, Any, Callable, Iterator
+from collections import OrderedDict
+from threading import Lock, RLock
+from typing import List, Dict, Set, Tuple, Optional, Any
+from typing import Callable, Iterable, Iterator
 
 DBEntry = Tuple[int, str, str, Any]
 
 
 class OnceDB:
+    ITER_BATCH = 1000  # rows fetched at once by iter()
+    SEEN_CACHE = 4096  # number of known (cohort, uid) pairs kept in memory
+    # connections are shared by all instances with the same db_path
+    _pool = {}  # type: Dict[str, List[Any]] # path -> [conn, lock, refs, seen]
+    _pool_lock = Lock()
+    _orphans = []  # type: List[Tuple[str, List[Any]]] # see __del__
+
     def __init__(self, db_path: str) -> None:
-        self._db = sqlite3.connect(db_path)
-        self._db.execute('''
+        self._entry = None  # type: Optional[List[Any]]
+        memory = db_path == ':memory:'  # each one is a separate db
+        self._path = db_path if memory else os.path.abspath(db_path)
+        with OnceDB._pool_lock:
+            entry = None if memory else OnceDB._pool.get(self._path)
+            if not entry:
+                entry = [OnceDB._connect(db_path), RLock(), 0, OrderedDict()]
+                if not memory:
+                    OnceDB._pool[self._path] = entry
+            entry[2] += 1
+        self._entry = entry
+        OnceDB._release_orphans()  # after acquire, keeps connection open
+        self._db = entry[0]  # type: sqlite3.Connection
+        self._lock = entry[1]  # serialize write transactions across threads
+        self._cur = self._db.cursor()  # reused by lookups (under lock)
+        # LRU of existing (cohort, uid) pairs, only positive results
+        self._seen = entry[3]  # type: OrderedDict[Tuple[str, str], None]
+
+    @staticmethod
+    def _connect(db_path: str) -> sqlite3.Connection:
+        ''' [internal] Open new connection and create tables. '''
+        # statements are prepared once and reused via the statement cache.
+        # autocommit mode, batch methods use explicit transactions instead
+        db = sqlite3.connect(db_path, check_same_thread=False,
+                             cached_statements=256, isolation_level=None)
+        db.executescript('''
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;  -- WAL is still consistent
+            PRAGMA mmap_size = 268435456;  -- 256 MB
+            PRAGMA cache_size = -65536;  -- 64 MB
+            PRAGMA temp_store = MEMORY;
             CREATE TABLE IF NOT EXISTS queue(
                 ts DATE DEFAULT (strftime('%s', 'now')),
                 cohort TEXT NOT NULL,
@@ -25,59 +69,193 @@ class OnceDB:
                 obj BLOB,  -- NULL signals a done mark. OR: introduce new var
                 PRIMARY KEY (cohort, uid)  -- SQLite will auto-create index
             );
+            -- index is ordered by ROWID per key, iter() can skip sorting
+            CREATE INDEX IF NOT EXISTS queue_pending ON queue(obj IS NOT NULL);
+            DROP INDEX IF EXISTS queue_obj;  -- former (cohort, obj) index
+            -- used by cleanup(), only contains done entries
+            CREATE INDEX IF NOT EXISTS queue_done ON queue(cohort)
+                WHERE obj IS NULL;
+            -- arbitrary per-cohort values, e.g., ETag of last processed page
+            CREATE TABLE IF NOT EXISTS state(
+                cohort TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT,
+                PRIMARY KEY (cohort, key)
+            ) WITHOUT ROWID;
         ''')
+        return db
+
+    @staticmethod
+    def _release(key: str, entry: List[Any], *, force: bool = False) -> None:
+        ''' [internal] Close shared connection if no longer referenced. '''
+        with OnceDB._pool_lock:
+            if entry[2] <= 0:
+                return  # already closed
+            entry[2] = 0 if force else entry[2] - 1
+            if entry[2] > 0:
+                return  # still used by another instance
+            if OnceDB._pool.get(key) is entry:
+                del OnceDB._pool[key]
+        with entry[1]:
+            try:
+                entry[0].execute('PRAGMA optimize;')
+            finally:
+                entry[0].close()
+
+    @staticmethod
+    def _release_orphans() -> None:
+        ''' [internal] Release entries of garbage collected instances. '''
+        while True:
+            try:
+                key, entry = OnceDB._orphans.pop()  # atomic
+            except IndexError:
+                return
+            OnceDB._release(key, entry)
+
+    @staticmethod
+    def _close_all() -> None:
+        ''' [internal] Called on exit. Close all remaining connections. '''
+        OnceDB._release_orphans()
+        for key, entry in list(OnceDB._pool.items()):
+            OnceDB._release(key, entry, force=True)
 
     def __del__(self) -> None:
-        self._db.close()
+        # GC may run while this thread holds _pool_lock, never block here.
+        # Released on next init / close() (or on exit).
+        entry, self._entry = getattr(self, '_entry', None), None
+        if entry:
+            OnceDB._orphans.append((self._path, entry))  # atomic
+
+    def __enter__(self) -> 'OnceDB':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        '''
+        Release database connection. Object is unusable afterwards.
+        The connection is closed once all instances of db_path are closed.
+        '''
+        entry, self._entry = self._entry, None
+        if entry:
+            OnceDB._release(self._path, entry)
+        OnceDB._release_orphans()
 
     def cleanup(self, limit: int = 200) -> None:
         ''' Delete oldest (cohort) entries if more than limit exist. '''
-        self._db.execute('''
-            WITH _tmp AS (
-                SELECT ROWID, row_number() OVER (
-                    PARTITION BY cohort ORDER by ROWID DESC) AS c
-                FROM queue
-                WHERE obj IS NULL
-            )
-            DELETE FROM queue
-            WHERE ROWID in (SELECT ROWID from _tmp WHERE c > ?);
-        ''', (limit,))
-        self._db.commit()
+        with self._lock, self._db:  # commit or rollback
+            self._db.execute('BEGIN IMMEDIATE;')
+            cohorts = self._db.execute('SELECT DISTINCT cohort FROM queue;')
+            # keep newest done entries per cohort, uses index queue_done
+            self._db.executemany('''
+                DELETE FROM queue
+                WHERE cohort = ?1 AND obj IS NULL AND ROWID NOT IN (
+                    SELECT ROWID FROM queue
+                    WHERE cohort = ?1 AND obj IS NULL
+                    ORDER BY ROWID DESC LIMIT ?2
+                );
+            ''', [(cohort, limit) for cohort, in cohorts.fetchall()])
+            self._seen.clear()
 
     def put(self, cohort: str, uid: str, obj: str) -> bool:
         ''' Silently ignore if a duplicate (cohort, uid) is added. '''
-        try:
-            self._db.execute('''
-                INSERT INTO queue (cohort, uid, obj) VALUES (?, ?, ?);
+        with self._lock:
+            cur = self._db.execute('''
+                INSERT OR IGNORE INTO queue (cohort, uid, obj)
+                VALUES (?, ?, ?);
                 ''', (cohort, uid, obj))
-            self._db.commit()
-            return True
-        except sqlite3.IntegrityError:
-            # entry (cohort, uid) already exists
-            return False
+            if cur.rowcount == 1:
+                self._remember((cohort, uid))
+        return cur.rowcount == 1  # 0 if entry (cohort, uid) already exists
+
+    def put_many(self, entries: Iterable[Tuple[str, str, str]]) -> int:
+        '''
+        Same as `put()` for many (cohort, uid, obj) tuples in a single
+        transaction. Return number of newly added entries.
+        '''
+        with self._lock, self._db:  # commit or rollback
+            self._db.execute('BEGIN IMMEDIATE;')
+            cur = self._db.executemany('''
+                INSERT OR IGNORE INTO queue (cohort, uid, obj)
+                VALUES (?, ?, ?);
+                ''', entries)
+        return cur.rowcount
 
     def contains(self, cohort: str, uid: str) -> bool:
         ''' Test if cohort + uid pair exists in database. '''
-        cur = self._db.cursor()
-        cur.execute('''
-            SELECT 1 FROM queue WHERE cohort IS ? AND uid is ? LIMIT 1;
-            ''', (cohort, uid))
-        flag = cur.fetchone() is not None
-        cur.close()
-        return flag
+        key = (cohort, uid)
+        with self._lock:
+            if key in self._seen:
+                self._seen.move_to_end(key)
+                return True
+            # '=' (not 'IS') to use the primary key lookup
+            row = self._cur.execute('''
+                SELECT 1 FROM queue WHERE cohort = ? AND uid = ? LIMIT 1;
+                ''', key).fetchone()
+            if row is not None:
+                self._remember(key)
+        return row is not None
+
+    def _remember(self, key: Tuple[str, str]) -> None:
+        ''' [internal] Add existing (cohort, uid) to LRU cache. '''
+        self._seen[key] = None
+        self._seen.move_to_end(key)
+        if len(self._seen) > self.SEEN_CACHE:
+            self._seen.popitem(last=False)
+
+    def contains_many(self, cohort: str, uids: Iterable[str]) -> Set[str]:
+        ''' Return the subset of uids which exist in database for cohort. '''
+        todo = list(uids)
+        found = set()  # type: Set[str]
+        with self._lock:
+            for i in range(0, len(todo), 900):  # max. 999 sql parameters
+                chunk = todo[i:i + 900]
+                found.update(uid for uid, in self._cur.execute('''
+                    SELECT uid FROM queue WHERE cohort = ? AND uid IN ({});
+                    '''.format(','.join('?' * len(chunk))), [cohort] + chunk))
+        return found
+
+    def get_state(self, cohort: str, key: str) -> Optional[str]:
+        ''' Return value stored with `set_state()` or None if not set. '''
+        with self._lock:
+            row = self._cur.execute('''
+                SELECT value FROM state WHERE cohort = ? AND key = ?;
+                ''', (cohort, key)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, cohort: str, key: str, value: str) -> None:
+        ''' Store (or replace) a value. Not part of the queue / iter(). '''
+        with self._lock:
+            self._db.execute('''
+                INSERT OR REPLACE INTO state (cohort, key, value)
+                VALUES (?, ?, ?);
+                ''', (cohort, key, value))
 
     def mark_done(self, rowid: int) -> None:
         ''' Mark (ROWID) as done. Entry remains in cache until cleanup(). '''
         if not isinstance(rowid, int):
             raise AttributeError('Not of type ROWID: {}'.format(rowid))
-        self._db.execute('UPDATE queue SET obj = NULL WHERE ROWID = ?;',
-                         (rowid, ))
-        self._db.commit()
+        with self._lock:
+            self._db.execute('UPDATE queue SET obj = NULL WHERE ROWID = ?;',
+                             (rowid, ))
+
+    def mark_done_many(self, rowids: Iterable[int]) -> None:
+        ''' Same as `mark_done()` for many ROWIDs in a single transaction. '''
+        with self._lock, self._db:  # commit or rollback
+            self._db.execute('BEGIN IMMEDIATE;')
+            self._db.executemany(
+                'UPDATE queue SET obj = NULL WHERE ROWID = ?;',
+                ((x, ) for x in rowids))
 
     def mark_all_done(self) -> None:
         ''' Mark all entries done. Entry remains in cache until cleanup(). '''
-        self._db.execute('UPDATE queue SET obj = NULL;')
-        self._db.commit()
+        with self._lock:
+            # only touch pending rows, done rows are NULL already
+            self._db.execute('''
+                UPDATE queue SET obj = NULL
+                WHERE (obj IS NOT NULL) = 1;  -- must match index expression
+            ''')
 
     def foreach(
         self,
@@ -88,11 +266,18 @@ class OnceDB:
         Exec for all until callback evaluates to false (or end of list).
         Automatically marks entries as done (only on success).
         '''
-        for rowid, *elem in reversed(self) if reverse else self:
-            if callback(*elem):
-                self.mark_done(rowid)
-            else:
-                return False
+        done = []  # type: List[int] # marked in batches of 100
+        try:
+            for rowid, *elem in reversed(self) if reverse else self:
+                if not callback(*elem):
+                    return False
+                done.append(rowid)
+                if len(done) >= 100:
+                    self.mark_done_many(done)
+                    done.clear()
+        finally:
+            if done:  # also if callback raised an exception
+                self.mark_done_many(done)
         return True
 
     def __iter__(self) -> Iterator[DBEntry]:
@@ -102,12 +287,27 @@ class OnceDB:
         return self.iter(desc=True)
 
     def iter(self, *, desc: bool = False) -> Iterator[DBEntry]:
-        ''' Perform query on all un-marked / not-done entries. '''
-        cur = self._db.cursor()
-        cur.execute('''
+        '''
+        Perform query on all un-marked / not-done entries.
+        Rows are fetched in batches of `ITER_BATCH` (one query per batch).
+        No statement is active while rows are yielded, thus `mark_done()`
+        may be called during iteration.
+        '''
+        query = '''
             SELECT ROWID, cohort, uid, obj FROM queue
-            WHERE obj IS NOT NULL
-            ORDER BY ROWID {};
-        '''.format('DESC' if desc else 'ASC'))
-        yield from cur.fetchall()
-        cur.close()
+            WHERE (obj IS NOT NULL) = 1  -- must match index expression
+            AND ROWID {} ? ORDER BY ROWID {} LIMIT ?;
+        '''.format('<' if desc else '>', 'DESC' if desc else 'ASC')
+        last = 2 ** 63 - 1 if desc else 0  # continue after last seen ROWID
+        while True:
+            with self._lock:
+                rows = self._cur.execute(
+                    query, (last, self.ITER_BATCH)).fetchall()
+            if not rows:
+                break
+            last = rows[-1][0]
+            yield from rows
+            if len(rows) < self.ITER_BATCH:
+                break
+
+atexit.register(OnceDB._close_all)
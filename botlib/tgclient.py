@@ -1,7 +1,17 @@
 #!/usr/bin/env python3
 import telebot  # pip3 install pytelegrambotapi
+import requests  # dependency of pytelegrambotapi
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from telebot import apihelper
+import ssl
+import hmac
+import secrets
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from urllib.parse import urlparse
 from threading import Thread
-from time import sleep
+from time import sleep, monotonic
 from typing import List, Optional, Any, Union, Iterable, Callable
 from telebot.types import Message, Chat  # typing
 from .helper import Log
@@ -12,11 +22,18 @@ class Kill(Exception):
     pass
 
 
+class _WebhookServer(ThreadingMixIn, HTTPServer):
+    ''' [internal] One thread per request. '''
+    daemon_threads = True
+
+
 class TGClient(telebot.TeleBot):
     '''
     Telegram client. Wrapper around telebot.TeleBot.
     If `polling` if False, you can run the bot for a single send_message.
     If `allowedUsers` is None, all users are allowed.
+    `long_polling_timeout` is the time (in sec) the Telegram server holds
+    a getUpdates request open until updates arrive.
     '''
 
     def __init__(
@@ -24,41 +41,135 @@ class TGClient(telebot.TeleBot):
         apiKey: str,
         *, polling: bool,
         allowedUsers: Optional[List[str]] = None,
+        long_polling_timeout: int = 25,
         **kwargs: Any
     ) -> None:
         ''' If '''
         super().__init__(apiKey, **kwargs)
+        if apihelper.session is None:
+            apihelper.session = TGClient._session()
         self.users = allowedUsers
         self.onKillCallback = None  # type: Optional[Callable[[], None]]
 
         if polling:
             def _fn() -> None:
+                backoff = 15
+                while True:
+                    started = monotonic()
+                    try:
+                        Log.info('Ready')
+                        self.polling(  # none_stop=True
+                            skip_pending=True, interval=0,
+                            long_polling_timeout=long_polling_timeout,
+                            # read timeout must exceed the server hold time
+                            timeout=long_polling_timeout + 5)
+                        return
+                    except Kill:
+                        Log.info('Quit by /kill command.')
+                        if self.onKillCallback:
+                            self.onKillCallback()
+                        return
+                    except Exception as e:
+                        Log.error(e)
+                    if monotonic() - started > 300:  # was healthy, reset
+                        backoff = 15
+                    Log.info('Auto-restart in {} sec ...'.format(backoff))
+                    sleep(backoff)
+                    backoff = min(backoff * 2, 300)  # exponential backoff
+
+            Thread(target=_fn, name='Polling').start()
+            self._add_default_handlers()
+
+    def _add_default_handlers(self) -> None:
+        ''' [internal] Register /? (healthcheck) and /kill commands. '''
+        @self.message_handler(commands=['?'])
+        def _healthcheck(message: Message) -> None:
+            if self.allowed(message):
+                self.reply_to(message, 'yes')
+
+        @self.message_handler(commands=['kill'])
+        def _kill(message: Message) -> None:
+            if self.allowed(message):
+                self.reply_to(message, 'bye bye')
+                raise Kill()
+
+    def start_webhook(
+        self,
+        url: str,
+        *, listen: str = '0.0.0.0',
+        port: int = 8443,
+        cert: Optional[str] = None,
+        key: Optional[str] = None
+    ) -> None:
+        '''
+        Receive updates via webhook instead of polling (use `polling=False`).
+        Telegram will POST updates to `url`, served on `listen:port`.
+        `cert` and `key` are file paths for a (self-signed) certificate.
+        Omit them if TLS is terminated by a reverse proxy.
+        Requests without the (random) secret token are rejected (403).
+        '''
+        bot = self
+        path = urlparse(url).path or '/'
+        # Telegram sends it in every request, reject forged updates
+        secret = secrets.token_urlsafe(32)
+        # process updates in the request thread, so Kill can be caught
+        self.threaded = False
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                if self.path != path:
+                    self.send_error(404)
+                    return
+                token = self.headers.get('X-Telegram-Bot-Api-Secret-Token')
+                if not token or not hmac.compare_digest(token, secret):
+                    self.send_error(403)
+                    return
+                size = int(self.headers.get('Content-Length', 0))
+                update = telebot.types.Update.de_json(
+                    self.rfile.read(size).decode('utf-8'))
+                self.send_response(200)
+                self.end_headers()
                 try:
-                    Log.info('Ready')
-                    self.polling(skip_pending=True)  # none_stop=True
+                    bot.process_new_updates([update])
                 except Kill:
                     Log.info('Quit by /kill command.')
-                    if self.onKillCallback:
-                        self.onKillCallback()
-                    return
+                    bot.remove_webhook()
+                    Thread(target=server.shutdown).start()
+                    if bot.onKillCallback:
+                        bot.onKillCallback()
                 except Exception as e:
                     Log.error(e)
-                    Log.info('Auto-restart in 15 sec ...')
-                    sleep(15)
-                    _fn()
 
-            Thread(target=_fn, name='Polling').start()
-
-            @self.message_handler(commands=['?'])
-            def _healthcheck(message: Message) -> None:
-                if self.allowed(message):
-                    self.reply_to(message, 'yes')
+            def log_message(self, *args: Any) -> None:
+                pass  # no access log
+
+        server = _WebhookServer((listen, port), _Handler)
+        if cert:
+            ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            ctx.load_cert_chain(cert, key)
+            server.socket = ctx.wrap_socket(server.socket, server_side=True)
+        self._add_default_handlers()
+        self.remove_webhook()
+        if cert:
+            with open(cert) as fp:
+                self.set_webhook(url=url, certificate=fp,
+                                 secret_token=secret)
+        else:
+            self.set_webhook(url=url, secret_token=secret)
+        Thread(target=server.serve_forever, name='Webhook').start()
+        Log.info('Ready')
 
-            @self.message_handler(commands=['kill'])
-            def _kill(message: Message) -> None:
-                if self.allowed(message):
-                    self.reply_to(message, 'bye bye')
-                    raise Kill()
+    @staticmethod
+    def _session() -> requests.Session:
+        '''
+        HTTP session shared by all API calls (and threads). Keeps TCP + TLS
+        connections to the Telegram API alive instead of reconnecting.
+        '''
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8,
+                              max_retries=Retry(total=3, backoff_factor=0.3))
+        session.mount('https://api.telegram.org', adapter)
+        return session
 
     def set_on_kill(self, callback: Optional[Callable[[], None]]) -> None:
         ''' Callback is executed when a Kill exception is raised. '''
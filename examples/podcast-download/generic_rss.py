@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 import os
 from sys import stderr
-from typing import Dict, Any, Optional, TextIO
+from typing import Dict, Set, Any, Optional, TextIO
 from datetime import datetime  # typing
 
 from botlib.cli import Cli
@@ -9,6 +9,8 @@ from botlib.curl import Curl
 from botlib.feed2list import Feed2List
 from botlib.helper import StrFormat, FileWrite
 
+_EMPTY = {}  # type: Dict[str, str] # default, do not modify
+
 
 def main() -> None:
     ''' CLI entry. '''
@@ -45,6 +47,7 @@ def process(
 
     # process
     dest = dest_dir
+    year_dirs = set()  # type: Set[str] # already created
     for entry in reversed(Feed2List(fp, keys=[
         'link', 'title', 'description', 'enclosure',  # audio
         'pubDate', 'media:content',  # image
@@ -53,12 +56,18 @@ def process(
         date = entry['pubDate']  # try RSS only # type: datetime
         if by_year:
             dest = os.path.join(dest_dir, str(date.year))
-            if not dry_run and not os.path.exists(dest):
-                os.mkdir(dest)
+            if not dry_run and dest not in year_dirs:
+                os.makedirs(dest, exist_ok=True)
+                year_dirs.add(dest)
         process_entry(entry, date, dest, dry_run=dry_run)
     return True
 
 
+def resolution(img: Dict[str, str]) -> int:
+    ''' Image size in pixels (0 if unknown). '''
+    return int(img.get('width', 0)) * int(img.get('height', 0))
+
+
 def process_entry(
     entry: Dict[str, Any],
     date: datetime,
@@ -68,21 +77,16 @@ def process_entry(
     ''' Parse a single podcast media entry. '''
     title = entry['title']
     # <enclosure url="*.mp3" length="47216000" type="audio/mpeg"/>
-    audio_url = entry.get('enclosure', {}).get('url')
+    audio_url = entry.get('enclosure', _EMPTY).get('url')
     if not audio_url:
         print('  ERROR: URL not found for "{}"'.format(title), file=stderr)
         return
     # <media:content url="*.jpg" width="300" rel="full_image" height="300" />
-    images = entry.get('media:content', [])
+    images = entry.get('media:content', ())
     if not isinstance(images, list):
-        images = [images]
-    maxRes = 0
-    image_url = None
-    for img in images:
-        res = int(img.get('width', 0)) * int(img.get('height', 0))
-        if res > maxRes:
-            maxRes = res
-            image_url = img.get('url')
+        images = (images,)
+    best = max(images, key=resolution, default=None)
+    image_url = best.get('url') if best and resolution(best) > 0 else None
     # make request
     fname = '{} - {}'.format(date.strftime('%Y-%m-%d'),
                              StrFormat.safe_filename(title))
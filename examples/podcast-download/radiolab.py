@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 import os
 from sys import stderr
-from typing import Dict, Tuple, Optional, Any
+from concurrent.futures import ThreadPoolExecutor, Future, wait, as_completed
+from typing import Dict, List, Set, Tuple, Optional, Any
 
 from botlib.cli import Cli
 from botlib.curl import Curl, URLError
@@ -10,8 +11,13 @@ from botlib.oncedb import OnceDB
 
 API = 'http://api.wnyc.org/api/v3'
 COHORT = 'radiolab'
-db_ids = OnceDB('radiolab_ids.sqlite')
-db_slugs = OnceDB('radiolab_slugs.sqlite')
+COHORT_SLUG = 'radiolab-slug'
+db = OnceDB('radiolab_ids.sqlite')  # both, (uid -> fname) and (slug -> uid)
+if os.path.isfile('radiolab_slugs.sqlite'):  # migrate former separate db
+    with OnceDB('radiolab_slugs.sqlite') as _old:
+        db.put_many((COHORT_SLUG, slug, uid) for _, _, uid, slug in _old)
+    os.rename('radiolab_slugs.sqlite', 'radiolab_slugs.sqlite.migrated')
+year_dirs = set()  # type: Set[str] # already created dest dirs
 # published-at does not contain timezone info, but is assumed to be EST
 os.environ['TZ'] = 'America/New_York'
 
@@ -47,26 +53,53 @@ def processEpisodeList(
 ) -> None:
     ''' Parse full podcast category. '''
     print('\nProcessing: {}'.format(title), end='')
-    url = '{}/channel/shows/{}/{}?limit=9'.format(API, query, index)
-    dat = Curl.json(url)  # type: Dict[str, Any]
-    total = dat['data']['attributes']['total-pages']
-    print(' ({}/{})'.format(index, total))
-    anything_new = False
-    for inc in dat['included']:
-        anything_new |= processEpisode(inc['attributes'], basedir,
-                                       dry_run=dry_run)
-    if anything_new and index < total:
-        processEpisodeList(basedir, title, query, index + 1, dry_run=dry_run)
+
+    def page_url(idx: int) -> str:
+        return '{}/channel/shows/{}/{}?limit=9'.format(API, query, idx)
+
+    with ThreadPoolExecutor(max_workers=1) as pool, \
+            ThreadPoolExecutor(max_workers=4) as workers:
+        dat = Curl.json(page_url(index))  # type: Dict[str, Any]
+        while True:
+            total = dat['data']['attributes']['total-pages']
+            print(' ({}/{})'.format(index, total))
+            nxt = None  # type: Optional[Future[Dict[str, Any]]]
+            done = []  # type: List[Tuple[str, str, str]] # uid, fname, slug
+            futures = []  # type: List[Future[bool]]
+            try:
+                # download episodes of a page concurrently
+                for inc in dat['included']:
+                    futures.append(workers.submit(
+                        processEpisode, inc['attributes'], basedir, done,
+                        dry_run=dry_run))
+                for fut in as_completed(futures):
+                    # found a new episode, prefetch next page meanwhile
+                    if fut.result() and not nxt and index < total:
+                        nxt = pool.submit(Curl.json, page_url(index + 1))
+            finally:
+                wait(futures)  # all finished (or failed) before saving
+                # save state of the whole page in a single transaction
+                if done:
+                    db.put_many(x for uid, fname, slug in done for x in (
+                        (COHORT, uid, fname), (COHORT_SLUG, slug, uid)))
+            if not nxt:  # nothing new (or last page)
+                break
+            dat = nxt.result()
+            index += 1
 
 
 def processEpisode(
     obj: Dict[str, Any],
     basedir: str,
+    done: List[Tuple[str, str, str]],
     *, dry_run: bool = False
 ) -> bool:
-    ''' Parse a single podcast episode. '''
+    '''
+    Parse a single podcast episode.
+    On success, append (uid, fname, slug) to `done` (saved by caller).
+    '''
     uid = obj['cms-pk']
-    if db_ids.contains(COHORT, uid):
+    if db.contains(COHORT, uid):
         return False  # Already exists
 
     title = obj['title'].strip()
@@ -78,8 +111,9 @@ def processEpisode(
 
     # create by-year subdir
     dest_dir = os.path.join(basedir, str(date.year))
-    if not dry_run and not os.path.exists(dest_dir):
-        os.mkdir(dest_dir)
+    if not dry_run and dest_dir not in year_dirs:
+        os.makedirs(dest_dir, exist_ok=True)
+        year_dirs.add(dest_dir)
 
     # make filename and download list
     fname = '{} - {}'.format(date.strftime('%Y-%m-%d'),
@@ -120,8 +154,7 @@ def processEpisode(
 
     # success! now save state
     if flag and not dry_run:
-        db_ids.put(COHORT, uid, fname)
-        db_slugs.put(COHORT, uid, slug)
+        done.append((uid, fname, slug))
         print('  SLUG: {}'.format(slug))
     return flag  # potentially need to query the next page too
 
@@ -154,12 +187,12 @@ def get_img_desc(obj: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
 def processSingle(slug: str, basedir: str) -> None:
     ''' [internal] process single episode if only the slug is known. '''
     # cms-pk = 91947 , slug = '91947-do-i-know-you'
-    all_slugs = [slug for _, _, _, slug in db_slugs]
-    if slug not in all_slugs:
+    if not db.contains(COHORT_SLUG, slug):  # primary key lookup
         print(slug)
         data = Curl.json('{}/story/{}'.format(API, slug))
         try:
-            processEpisode(data['data']['attributes'], basedir, dry_run=True)
+            processEpisode(data['data']['attributes'], basedir, [],
+                           dry_run=True)
         except URLError as e:
             print('  ERROR: ' + str(e), file=stderr)
 
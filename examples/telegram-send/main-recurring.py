@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+from time import sleep
 from botlib.cron import Cron
 from botlib.helper import Log
 from botlib.oncedb import OnceDB
@@ -11,15 +12,19 @@ from botlib.tgclient import TGClient
 import sub_job_a as jobA
 import sub_job_b as jobB
 
-cron = Cron()
-bot = TGClient(__API_KEY__, polling=True, allowedUsers=['my-username'])
+cron = Cron()  # serial: jobs share db.foreach(), which must not overlap
+db = OnceDB('cache.sqlite')  # shared by all jobs, keeps connection open
+bot = TGClient(__API_KEY__, polling=False, allowedUsers=['my-username'])
 bot.set_on_kill(cron.stop)
+# updates are pushed by Telegram (no polling). Or use polling=True above
+bot.start_webhook('https://my-domain.com:8443/bot', port=8443,
+                  cert='cert.pem', key='private.key')
 
 
 def main():
     def clean_db(_) -> None:
         Log.info('[clean up]')
-        OnceDB('cache.sqlite').cleanup(limit=150)
+        db.cleanup(limit=150)
 
     def notify_jobA(_) -> None:
         jobA.download(topic='development', cohort='dev:py')
@@ -38,7 +43,6 @@ def main():
 
 
 def send2telegram(chat_id: int) -> None:
-    db = OnceDB('cache.sqlite')
     # db.mark_all_done()
 
     def _send(cohort: str, uid: str, obj: str) -> bool:
@@ -47,9 +51,12 @@ def send2telegram(chat_id: int) -> None:
                        disable_web_page_preview=True)
         return msg is not None
 
-    if not db.foreach(_send):
-        # send() sleeps 45 sec (on error), safe to call immediatelly
-        send2telegram(chat_id)
+    for attempt in range(5):  # give up and try again on next cron tick
+        if attempt:
+            sleep(2 ** attempt)  # in addition to send() sleeping 45 sec
+        if db.foreach(_send):
+            return
+    Log.error('[push] failed 5 times, retry later')
 
 
 main()
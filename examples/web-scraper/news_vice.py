@@ -2,27 +2,51 @@
 from botlib.curl import Curl
 from botlib.html2list import HTML2List, MatchGroup
 from botlib.oncedb import OnceDB
+from typing import List, Tuple, Union
 
 
-def download(*, topic: str = 'motherboard', cohort: str = 'vice:mb') -> None:
+def render(match: MatchGroup) -> str:
+    ''' Message text for a single article. '''
+    return '<a href="https://www.vice.com{}">{}</a>\n{}'.format(
+        match['url'], match['title'], match['desc'])
+
+
+def download(
+    *, topic: Union[str, List[str]] = 'motherboard',
+    cohort: str = 'vice:mb'
+) -> None:
     db = OnceDB('cache.sqlite')
-    url = 'https://www.vice.com/en/topic/{}'.format(topic)
+    topics = [topic] if isinstance(topic, str) else topic
+    urls = ['https://www.vice.com/en/topic/{}'.format(x) for x in topics]
 
     select = '.vice-card__content'
     match = MatchGroup({
         'url': r'<a href="([^"]*)"',
-        'title': r'<h3[^>]*><a [^>]*>([\s\S]*?)</a>[\s\S]*?</h3>',
-        'desc': r'<p[^>]*>([\s\S]*?)</p>',
+        'title': r'(?s)<h3[^>]*><a [^>]*>(.*?)</a>.*?</h3>',
+        'desc': r'(?s)<p[^>]*>(.*?)</p>',
     })
-    for elem in reversed(HTML2List(select).parse(Curl.get(url))):
-        match.set_html(elem)
-        x_uid = match['url']
-        if not x_uid or db.contains(cohort, x_uid):
-            continue
-        txt = '<a href="https://www.vice.com{url}">{title}</a>'.format(**match)
-        txt += '\n' + str(match['desc'])
-        if txt:
-            db.put(cohort, x_uid, txt)
+    # skip parsing if page is unchanged since this cohort processed it (304)
+    # requires the server to send an ETag or Last-Modified header
+    since = [db.get_state(cohort, url) or '' for url in urls]
+    for url, source in zip(urls, Curl.get_many(
+            urls, only_modified=True, since=since)):
+        if not source:
+            continue  # not modified (or not available)
+        validator = Curl.validator(url)  # of this download
+        elements = [(elem, match.set_html(elem)['url']) for elem in
+                    reversed(HTML2List(select).parse(source))]
+        seen = db.contains_many(cohort, [x for _, x in elements if x])
+        new = []  # type: List[Tuple[str, str, str]]
+        for elem, x_uid in elements:
+            if not x_uid or x_uid in seen:
+                continue
+            seen.add(x_uid)
+            txt = render(match.set_html(elem))
+            if txt:
+                new.append((cohort, x_uid, txt))
+        if new:
+            db.put_many(new)  # single transaction
+        db.set_state(cohort, url, validator)  # only after successful save
 
 
 # download()
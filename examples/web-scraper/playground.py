@@ -8,9 +8,9 @@ SOURCE = Curl.get(URL, cache_only=True)
 SELECT = '.vice-card__content'
 match = MatchGroup({
     'url': r'<a href="([^"]*)"',
-    'title': r'<h3[^>]*><a [^>]*>([\s\S]*?)</a>[\s\S]*?</h3>',
-    'desc': r'<p[^>]*>([\s\S]*?)</p>',
-    'wrong-regex': r'<a xref="([\s\S]*?)"',
+    'title': r'(?s)<h3[^>]*><a [^>]*>(.*?)</a>.*?</h3>',
+    'desc': r'(?s)<p[^>]*>(.*?)</p>',
+    'wrong-regex': r'(?s)<a xref="(.*?)"',
 })
 for elem in reversed(HTML2List(SELECT).parse(SOURCE)):
     match.set_html(elem)
@@ -2,14 +2,21 @@
 from botlib.curl import Curl
 from botlib.html2list import HTML2List, MatchGroup
 from botlib.oncedb import OnceDB
-from typing import Optional, Callable, TextIO
+from typing import List, Tuple, Optional, Callable, TextIO
 
 CRAIGSLIST = 'https://newyork.craigslist.org/search/boo'
 
 
-def load(url: str) -> Optional[TextIO]:
+def load(url: str, since: str = '') -> Optional[TextIO]:
     # return open('test.html')
-    return Curl.get(url)
+    return Curl.get(url, only_modified=True, since=since)  # None if unchanged
+
+
+def render_boat(match: MatchGroup) -> str:
+    return '''
+<a href="{}">{}</a>
+<strong>{}</strong>, {}'''.format(
+        match['url'], match['title'], match['price'], match['hood'])
 
 
 def download() -> None:
@@ -17,36 +24,45 @@ def download() -> None:
 
     def proc(
         cohort: str,
-        source: Optional[TextIO],
+        url: str,
         select: str,
         regex: dict = {},
         fn: Callable[[MatchGroup], str] = str
     ) -> None:
+        source = load(url, db.get_state(cohort, url) or '')
+        if not source:
+            return  # not modified since last run (or not available)
+        validator = Curl.validator(url)  # of this download
         match = MatchGroup(regex)
-        for elem in reversed(HTML2List(select).parse(source)):
-            match.set_html(elem)
-            x_uid = match['url']
-            if not x_uid or db.contains(cohort, x_uid):
+        elements = [(elem, match.set_html(elem)['url']) for elem in
+                    reversed(HTML2List(select).parse(source))]
+        seen = db.contains_many(cohort, [x for _, x in elements if x])
+        new = []  # type: List[Tuple[str, str, str]]
+        for elem, x_uid in elements:
+            if not x_uid or x_uid in seen:
                 continue
+            seen.add(x_uid)
+            match.set_html(elem)
             txt = (fn(match) or '').strip()
             if txt:
                 print(txt)
-                db.put(cohort, x_uid, txt)
+                new.append((cohort, x_uid, txt))
+        if new:
+            db.put_many(new)  # single transaction
+        db.set_state(cohort, url, validator)  # only after successful save
 
-    proc('boat:craigslist', load(CRAIGSLIST), 'li.result-row', {
+    proc('boat:craigslist', CRAIGSLIST, 'li.result-row', {
         'url': r'<a href="([^"]*)"',
-        'title': r'<h3[\s\S]*?<a [^>]*>([\s\S]*?)</a>[\s\S]*?</h3>',
-        'price': r'<span class="result-price">([\s\S]*?)</span>',
-        'hood': r'<span class="result-hood">([\s\S]*?)</span>',
-    }, lambda match: '''
-<a href="{url}">{title}</a>
-<strong>{price}</strong>, {hood}'''.format(**match))
+        'title': r'(?s)<h3.*?<a [^>]*>(.*?)</a>.*?</h3>',
+        'price': r'(?s)<span class="result-price">(.*?)</span>',
+        'hood': r'(?s)<span class="result-hood">(.*?)</span>',
+    }, render_boat)
 
     # process another source ...
     # def fn(match):
     #     print(match.to_dict())
     #     return advanced_fn(match)
-    # proc(cohort, load(url), select, match, fn)
+    # proc(cohort, url, select, match, fn)
 
 
 # download()
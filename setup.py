@@ -19,7 +19,7 @@ setup(
             'html2list = botlib.html2list:_cli',
         ]
     },
-    python_requires='>=3.5',
+    python_requires='>=3.6',
     keywords=[
         'conversion',
         'converter',
@@ -36,7 +36,6 @@ setup(
         'Programming Language :: Python',
         'Programming Language :: Python :: 3',
         'Programming Language :: Python :: 3 :: Only',
-        'Programming Language :: Python :: 3.5',
         'Programming Language :: Python :: 3.6',
         'Programming Language :: Python :: 3.7',
         'Programming Language :: Python :: 3.8',